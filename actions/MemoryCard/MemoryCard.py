@@ -1,4 +1,5 @@
 import threading
+import time
 
 from loguru import logger as log
 
@@ -48,14 +49,14 @@ class MemoryCard(KeyAction):
             return
 
         codepoint = state["cards"][self.card_index]
-        gif_path = self.plugin_base.get_emoji_gif_path(codepoint)
+        media_path, tier, fps = self.plugin_base.get_emoji_media(codepoint)
 
-        if self._file_exists(gif_path):
-            self.set_media(media_path=gif_path, size=0.9)
+        if self._file_exists(media_path):
+            self._set_media_timed(media_path, tier, fps)
         else:
             # Fallback if GIF not found
             self.set_center_label(text="?", font_size=32)
-            log.warning(f"Emoji GIF not found: {gif_path}")
+            log.warning(f"Emoji GIF not found: {media_path}")
 
         self.set_background_color([80, 80, 120, 255])
 
@@ -69,6 +70,15 @@ class MemoryCard(KeyAction):
         self.set_center_label("", font_size=1)  # Clear label
         self.set_background_color([30, 30, 30, 255])  # Dark background
 
+    def _set_media_timed(self, media_path: str, tier: str, fps=None) -> None:
+        """Set emoji media and report how long the key update took"""
+        # Only override the playback rate for tiers that lower it
+        kwargs = {"fps": fps} if fps else {}
+        start = time.perf_counter()
+        self.set_media(media_path=media_path, size=0.9, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.plugin_base.render_quality.record_latency(elapsed_ms, tier)
+
     def _file_exists(self, path: str) -> bool:
         """Check if file exists"""
         import os
@@ -0,0 +1,284 @@
+import json
+import os
+import random
+import shutil
+import threading
+import time
+
+import requests
+from loguru import logger as log
+
+from .download_emojis import GIF_URL_PATTERN
+
+MAX_CONSECUTIVE_FAILURES = 5  # Failures in a row before backing off the mirror
+BACKOFF_START = 60            # Seconds, doubled while the mirror stays down
+BACKOFF_MAX = 3600
+MAX_EMOJI_FAILURES = 3        # Failed attempts before giving up on one emoji
+
+
+class EmojiAssetStore:
+    """Local emoji GIF cache filled on demand from a mirror.
+
+    Only the emoji index is required up front. Games draw from the GIFs that
+    are already on disk (read-only bundled directories, such as the seed set
+    shipped with the plugin, plus the cache) while a background worker fetches
+    the missing ones into the cache.
+    With a disk quota, emojis that were drawn the longest time ago are evicted
+    to make room; freshly fetched emojis are kept until they have been drawn
+    at least once, so the catalog rotates at the pace of play.
+    """
+
+    def __init__(self, bundled_dirs: list, cache_dir: str, codepoints: list,
+                 mirror: str = GIF_URL_PATTERN, quota_bytes: int = 0,
+                 fetch_interval: float = 0.5, on_evict=None, extra_bytes=None):
+        self.bundled_dirs = bundled_dirs
+        self.cache_dir = cache_dir
+        self.usage_path = os.path.join(cache_dir, "emoji_usage.json")
+        self.codepoints = list(codepoints)
+        self.mirror = mirror or GIF_URL_PATTERN
+        self.quota_bytes = quota_bytes          # 0 means unlimited
+        self.fetch_interval = fetch_interval    # Pause between two fetches
+        self.on_evict = on_evict                # Called with evicted codepoint
+        self.extra_bytes = extra_bytes          # Returns other cache bytes under the quota
+
+        self.bundled = {}     # codepoint -> path, shipped GIFs never evicted
+        self.available = {}   # codepoint -> file size in bytes, cached GIFs
+        self.pinned = set()   # Emojis of the current game, never evicted
+        self.failed = set()   # Emojis that failed, retried after a backoff
+        self.abandoned = set()  # Emojis that failed too often, never retried
+        self.failure_counts = {}  # codepoint -> failed attempts outside mirror outages
+        self.usage = self._load_usage()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._recent_failures = []  # Consecutive failed fetches
+        self._backoff = 0           # Current mirror backoff in seconds
+
+        self._scan()
+
+    def _scan(self) -> None:
+        """Index the GIFs already present on disk"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for codepoint in self.codepoints:
+            for directory in self.bundled_dirs:
+                path = os.path.join(directory, f"{codepoint}.gif")
+                if os.path.exists(path):
+                    self.bundled[codepoint] = path
+                    break
+            else:
+                path = self._cache_path(codepoint)
+                if os.path.exists(path):
+                    self.available[codepoint] = os.path.getsize(path)
+        local = len(self.bundled) + len(self.available)
+        log.info(f"Emoji assets: {local}/{len(self.codepoints)} available locally")
+
+    def _load_usage(self) -> dict:
+        """Load per-emoji draw statistics"""
+        if not os.path.exists(self.usage_path):
+            return {}
+        try:
+            with open(self.usage_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Could not read emoji usage file: {e}")
+            return {}
+
+    def _save_usage(self) -> None:
+        """Persist per-emoji draw statistics (lock must be held)"""
+        tmp_path = f"{self.usage_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.usage, f)
+            os.replace(tmp_path, self.usage_path)
+        except OSError as e:
+            log.warning(f"Could not save emoji usage file: {e}")
+
+    def _cache_path(self, codepoint: str) -> str:
+        """Return cache path of an emoji GIF"""
+        return os.path.join(self.cache_dir, f"{codepoint}.gif")
+
+    def get_path(self, codepoint: str) -> str:
+        """Return local path to an emoji GIF"""
+        return self.bundled.get(codepoint) or self._cache_path(codepoint)
+
+    def draw(self, count: int, exclude_prefixes: list) -> list:
+        """Pick random local emojis for a new game and pin them until the next one
+
+        Selection and pinning happen under one lock so the fetch worker cannot
+        evict a drawn emoji in between.
+        """
+        now = time.time()
+        with self._lock:
+            available = [c for c in self.codepoints
+                         if (c in self.bundled or c in self.available)
+                         and not any(c.startswith(prefix) for prefix in exclude_prefixes)]
+            if len(available) < count:
+                log.warning(f"Only {len(available)} emojis available locally, {count} requested")
+
+            selected = random.sample(available, min(count, len(available)))
+            self.pinned = set(selected)
+            for codepoint in selected:
+                entry = self.usage.setdefault(codepoint, {"draws": 0, "last_drawn": 0})
+                entry["draws"] += 1
+                entry["last_drawn"] = now
+            self._save_usage()
+        # Drawn emojis become evictable, which may unblock the worker
+        self._wake.set()
+        return selected
+
+    def start(self) -> None:
+        """Start the background fetch worker"""
+        if self._worker is not None:
+            return
+        self._worker = threading.Thread(target=self._run, name="EmojiAssetFetcher", daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        """Worker loop: fetch missing emojis until the catalog is complete"""
+        while True:
+            self._wake.clear()
+            with self._lock:
+                codepoint = self._next_missing()
+                has_room = codepoint is not None and self._make_room(codepoint)
+
+            if codepoint is None:
+                with self._lock:
+                    given_up = {c for c in self.failed
+                                if self.failure_counts.get(c, 0) >= MAX_EMOJI_FAILURES}
+                    self.abandoned |= given_up
+                    self.failed -= given_up
+                    retry = list(self.failed)
+                if given_up:
+                    log.warning(f"Emoji assets: giving up on {len(given_up)} emojis "
+                                f"after {MAX_EMOJI_FAILURES} failed attempts")
+                if not retry:
+                    if not self.abandoned:
+                        log.info("Emoji assets: full catalog available")
+                    return
+                self._back_off(f"{len(retry)} emojis failed to fetch", retry)
+                continue
+
+            if not has_room:
+                # Wait for a game to draw emojis (frees evictable space)
+                self._wake.wait(timeout=60)
+                continue
+
+            if self._fetch(codepoint):
+                if self._backoff:
+                    log.info("Emoji assets: fetching again after backoff")
+                self._recent_failures = []
+                self._backoff = 0
+            else:
+                self._recent_failures.append(codepoint)
+                if len(self._recent_failures) >= MAX_CONSECUTIVE_FAILURES:
+                    with self._lock:
+                        # The mirror was down, not these emojis
+                        for c in self._recent_failures:
+                            self.failure_counts.pop(c, None)
+                    self._back_off(f"Emoji mirror unavailable ({len(self._recent_failures)} "
+                                   "failures in a row)", self._recent_failures)
+                    self._recent_failures = []
+                    continue
+            time.sleep(self.fetch_interval)
+
+    def _back_off(self, reason: str, codepoints: list) -> None:
+        """Pause, then queue failed emojis again; longer each time nothing succeeds"""
+        self._backoff = min(max(self._backoff * 2, BACKOFF_START), BACKOFF_MAX)
+        log.warning(f"{reason}, retrying in {self._backoff}s")
+        time.sleep(self._backoff)
+        with self._lock:
+            self.failed.difference_update(codepoints)
+
+    def _next_missing(self):
+        """Pick the next emoji to fetch (lock must be held)
+
+        Emojis never drawn come first, picked at random so the local pool
+        spans categories, then evicted ones by most recent draw.
+        """
+        missing = [c for c in self.codepoints
+                   if c not in self.bundled and c not in self.available
+                   and c not in self.failed and c not in self.abandoned]
+        if not missing:
+            return None
+        never_drawn = [c for c in missing if self.usage.get(c, {}).get("draws", 0) == 0]
+        if never_drawn:
+            return random.choice(never_drawn)
+        return max(missing, key=lambda c: self.usage[c]["last_drawn"])
+
+    def _make_room(self, codepoint: str) -> bool:
+        """Evict least recently drawn emojis until under quota (lock must be held)
+
+        An emoji never drawn may displace any drawn one; a previously evicted
+        emoji may only displace emojis drawn less recently than itself, so a
+        full quota settles instead of churning.
+        """
+        if not self.quota_bytes:
+            return True
+
+        entry = self.usage.get(codepoint, {})
+        threshold = entry["last_drawn"] if entry.get("draws", 0) > 0 else float("inf")
+
+        # Reserve room for one more GIF of average size
+        average = sum(self.available.values()) // max(len(self.available), 1)
+        extra = self.extra_bytes() if self.extra_bytes else 0
+        candidates = sorted(
+            (c for c in self.available
+             if c not in self.pinned
+             and self.usage.get(c, {}).get("draws", 0) > 0
+             and self.usage[c]["last_drawn"] < threshold),
+            key=lambda c: self.usage[c]["last_drawn"],
+        )
+        while sum(self.available.values()) + extra + average > self.quota_bytes:
+            if not candidates:
+                return False
+            self._evict(candidates.pop(0))
+            if self.extra_bytes:
+                extra = self.extra_bytes()
+        return True
+
+    def _evict(self, codepoint: str) -> None:
+        """Delete an emoji GIF from disk (lock must be held)"""
+        try:
+            os.remove(self._cache_path(codepoint))
+        except FileNotFoundError:
+            pass
+        del self.available[codepoint]
+        log.debug(f"Evicted emoji {codepoint}")
+        if self.on_evict:
+            self.on_evict(codepoint)
+
+    def _fetch(self, codepoint: str) -> bool:
+        """Copy one emoji GIF from the mirror into the local cache"""
+        path = self._cache_path(codepoint)
+        tmp_path = f"{path}.tmp"
+        try:
+            if self.mirror.startswith(("http://", "https://")):
+                if "{codepoint}" in self.mirror:
+                    url = self.mirror.format(codepoint=codepoint)
+                else:
+                    url = f"{self.mirror.rstrip('/')}/{codepoint}.gif"
+                r = requests.get(url, timeout=10)
+                r.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    f.write(r.content)
+            else:
+                shutil.copyfile(os.path.join(self.mirror, f"{codepoint}.gif"), tmp_path)
+
+            with open(tmp_path, "rb") as f:
+                if f.read(4) != b"GIF8":
+                    raise ValueError("not a GIF file")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log.debug(f"Could not fetch emoji {codepoint}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self._lock:
+                self.failed.add(codepoint)
+                self.failure_counts[codepoint] = self.failure_counts.get(codepoint, 0) + 1
+            return False
+
+        with self._lock:
+            self.available[codepoint] = os.path.getsize(path)
+            self.failure_counts.pop(codepoint, None)
+        return True
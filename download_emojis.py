@@ -5,9 +5,12 @@ Télécharge tous les GIFs et crée l'index emoji_index.json.
 
 Usage:
     python download_emojis.py
+    python download_emojis.py --seed 40   # index + 40 GIFs au hasard, le reste à la demande
 """
 import os
 import json
+import random
+import argparse
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -15,8 +18,8 @@ API_URL = "https://googlefonts.github.io/noto-emoji-animation/data/api.json"
 GIF_URL_PATTERN = "https://fonts.gstatic.com/s/e/notoemoji/latest/{codepoint}/512.gif"
 
 
-def download_all_emojis(output_dir: str):
-    """Télécharge tous les émojis et crée l'index"""
+def download_all_emojis(output_dir: str, seed: int = 0):
+    """Télécharge les émojis et crée l'index (seed > 0 : seulement N au hasard)"""
     emojis_dir = os.path.join(output_dir, "emojis")
     os.makedirs(emojis_dir, exist_ok=True)
 
@@ -47,6 +50,11 @@ def download_all_emojis(output_dir: str):
         json.dump(emoji_index, f, indent=2, ensure_ascii=False)
     print(f"Index saved: {len(emoji_index)} emojis")
 
+    # En mode seed, le plugin récupère les autres GIFs en arrière-plan
+    # Échantillon aléatoire pour varier les catégories dès les premières parties
+    to_download = (random.sample(emoji_index, min(seed, len(emoji_index)))
+                   if seed > 0 else emoji_index)
+
     # Télécharger les GIFs en parallèle
     def download_gif(emoji):
         codepoint = emoji["codepoint"]
@@ -64,13 +72,13 @@ def download_all_emojis(output_dir: str):
         except Exception as e:
             return codepoint, False, str(e)
 
-    print(f"Downloading {len(emoji_index)} GIFs...")
+    print(f"Downloading {len(to_download)} GIFs...")
     downloaded = 0
     cached = 0
     failed = 0
 
     with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(download_gif, e): e for e in emoji_index}
+        futures = {executor.submit(download_gif, e): e for e in to_download}
         done = 0
         for future in as_completed(futures):
             done += 1
@@ -85,7 +93,7 @@ def download_all_emojis(output_dir: str):
                 print(f"  Failed: {codepoint} - {status}")
 
             if done % 50 == 0:
-                print(f"Progress: {done}/{len(emoji_index)}")
+                print(f"Progress: {done}/{len(to_download)}")
 
     print(f"\nDownload complete!")
     print(f"  Downloaded: {downloaded}")
@@ -94,6 +102,11 @@ def download_all_emojis(output_dir: str):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download Google Noto animated emojis")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="only download N random GIFs (0 = all)")
+    args = parser.parse_args()
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     assets_dir = os.path.join(script_dir, "assets")
-    download_all_emojis(assets_dir)
+    download_all_emojis(assets_dir, seed=args.seed)
@@ -1,5 +1,6 @@
 import os
 import json
+import math
 import random
 import time
 
@@ -14,6 +15,8 @@ from .actions.StartGame.StartGame import StartGame
 from .actions.MemoryCard.MemoryCard import MemoryCard
 from .actions.BackButton.BackButton import BackButton
 from .actions.ScoreDisplay.ScoreDisplay import ScoreDisplay
+from .render_quality import RenderQualityController
+from .asset_store import EmojiAssetStore
 
 
 class EmojiMemory(PluginBase):
@@ -42,6 +45,30 @@ class EmojiMemory(PluginBase):
         # Load emoji index
         self.emoji_index = self.load_emoji_index()
 
+        # Downloaded and generated media live outside the plugin checkout
+        cache_dir = os.path.join(gl.DATA_PATH, "cache", "com_pol_emoji_memory")
+
+        # Adapt emoji media quality to the measured key update latency
+        self.render_quality = RenderQualityController(
+            cache_dir=os.path.join(cache_dir, "variants")
+        )
+
+        # Emoji GIFs available locally, missing ones fetched in background
+        settings = self.get_settings() or {}
+        self.asset_store = EmojiAssetStore(
+            bundled_dirs=[
+                os.path.join(self.PATH, "assets", "seed"),
+                os.path.join(self.PATH, "assets", "emojis"),  # make download-emojis
+            ],
+            cache_dir=os.path.join(cache_dir, "emojis"),
+            codepoints=[e["codepoint"] for e in self.emoji_index],
+            mirror=self.get_asset_mirror(settings),
+            quota_bytes=self.get_asset_quota_bytes(settings),
+            on_evict=self.render_quality.discard_variants,
+            extra_bytes=self.render_quality.cache_bytes,
+        )
+        self.asset_store.start()
+
         # Register actions
         self.start_game_holder = ActionHolder(
             plugin_base=self,
@@ -93,16 +120,48 @@ class EmojiMemory(PluginBase):
         with open(index_path, "r", encoding="utf-8") as f:
             return json.load(f)
 
+    def get_asset_mirror(self, settings: dict):
+        """Read the asset_mirror setting (None means default mirror)"""
+        mirror = settings.get("asset_mirror")
+        if mirror is None or (isinstance(mirror, str) and mirror.strip()):
+            return mirror
+        log.warning(f"Invalid asset_mirror setting {mirror!r}, using default mirror")
+        return None
+
+    def get_asset_quota_bytes(self, settings: dict) -> int:
+        """Read the asset_quota_mb setting in bytes (0 means unlimited)"""
+        quota_mb = settings.get("asset_quota_mb", 0)
+        try:
+            quota_mb = float(quota_mb or 0)
+        except (TypeError, ValueError):
+            quota_mb = -1
+        if not math.isfinite(quota_mb) or quota_mb < 0:
+            log.warning(f"Invalid asset_quota_mb setting {settings.get('asset_quota_mb')!r}, "
+                        "using no quota")
+            return 0
+        return int(quota_mb * 1024 * 1024)
+
     def get_emoji_gif_path(self, codepoint: str) -> str:
         """Return local path to emoji GIF (no download)"""
-        return os.path.join(self.PATH, "assets", "emojis", f"{codepoint}.gif")
+        return self.asset_store.get_path(codepoint)
+
+    def get_emoji_media(self, codepoint: str) -> tuple:
+        """Return path to emoji media, its render quality tier and playback fps"""
+        gif_path = self.get_emoji_gif_path(codepoint)
+        if not os.path.exists(gif_path):
+            return gif_path, None, None
+        return self.render_quality.get_media(codepoint, gif_path)
+
+    def get_render_diagnostics(self) -> dict:
+        """Return render quality tier and history for diagnostics"""
+        return self.render_quality.get_diagnostics()
 
     def get_card_back_path(self) -> str:
         """Return path to card back image"""
         return os.path.join(self.PATH, "assets", "card_back.png")
 
     def get_random_emojis(self, count: int) -> list:
-        """Select random emojis for a game (filtered for kids)"""
+        """Select random emojis for a game among local ones (filtered for kids)"""
         if not self.emoji_index:
             log.error("No emoji index loaded!")
             return []
@@ -112,14 +171,7 @@ class EmojiMemory(PluginBase):
             "1f595",  # middle finger
         ]
 
-        available = []
-        for e in self.emoji_index:
-            codepoint = e["codepoint"]
-            # Check if codepoint starts with any blocked prefix
-            if not any(codepoint.startswith(prefix) for prefix in blocked_prefixes):
-                available.append(codepoint)
-
-        return random.sample(available, min(count, len(available)))
+        return self.asset_store.draw(count, blocked_prefixes)
 
     def register_action(self, card_index: int, action):
         """Register a MemoryCard action instance"""
@@ -158,6 +210,11 @@ class EmojiMemory(PluginBase):
         cards = selected_emojis * 2  # Create pairs
         random.shuffle(cards)
 
+        # Prepare degraded media for this game's emojis in the background
+        self.render_quality.set_active(
+            {c: self.get_emoji_gif_path(c) for c in selected_emojis}
+        )
+
         # Initialize game state
         self.game_state["cards"] = cards
         self.game_state["revealed"] = []
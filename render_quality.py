@@ -0,0 +1,320 @@
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+from loguru import logger as log
+
+# Quality tiers, from best to cheapest
+TIER_FULL = "full"                # Original 512px animated GIF
+TIER_REDUCED_FPS = "reduced_fps"  # Every other frame dropped
+TIER_LOW_RES = "low_res"          # Reduced frame rate + downscaled
+TIER_STATIC = "static"            # Single still frame
+TIERS = [TIER_FULL, TIER_REDUCED_FPS, TIER_LOW_RES, TIER_STATIC]
+
+LOW_RES_SIZE = 128
+
+# Playback fps per tier, None keeps StreamController's set_media default (30).
+# Frames advance one per tick regardless of GIF durations, so variants drop
+# every other frame and play at half the rate to keep the original speed.
+DEFAULT_FPS = 30
+TIER_FPS = {
+    TIER_FULL: None,
+    TIER_REDUCED_FPS: DEFAULT_FPS // 2,
+    TIER_LOW_RES: DEFAULT_FPS // 2,
+    TIER_STATIC: None,
+}
+
+
+class RenderQualityController:
+    """Pick the emoji media quality from the measured key update latency.
+
+    Every emoji set_media call is timed and folded into a moving average. When
+    the average stays above the target the controller steps down one tier,
+    remembering what the better tier cost. It only steps back up once that
+    cost, scaled by how much the current tier got faster since, fits the
+    target again. Each step down doubles the minimum time before a step up.
+    """
+
+    def __init__(self, cache_dir: str, target_ms: float = 60.0,
+                 recover_margin: float = 0.8, min_samples: int = 4,
+                 recover_samples: int = 12, smoothing: float = 0.3,
+                 cooldown: float = 10.0, max_cooldown: float = 600.0,
+                 history_size: int = 50):
+        self.cache_dir = cache_dir
+        self.target_ms = target_ms
+        self.recover_margin = recover_margin  # Share of the target a step up must fit in
+        self.min_samples = min_samples        # Samples before judging a tier
+        self.recover_samples = recover_samples  # Calm samples before stepping up
+        self.smoothing = smoothing            # Weight of the newest sample
+        self.base_cooldown = cooldown         # Seconds before a step up, doubled per step down
+        self.max_cooldown = max_cooldown
+
+        self.tier_index = 0
+        self.history = deque(maxlen=history_size)
+        self._average_ms = None
+        self._samples = 0
+        self._calm_samples = 0
+        self._left_average_ms = {}  # tier index -> average when stepping down from it
+        self._entry_average_ms = {}  # tier index -> settled average after stepping down to it
+        self._cooldown = cooldown
+        self._hold_until = 0.0
+        self._last_recover = 0.0
+        self._active = {}  # codepoint -> source GIF path for the current game
+        self._builds_pending = threading.Event()
+        self._builder = None
+        self._lock = threading.Lock()
+
+        self._record_change(None, TIER_FULL, "initial", None)
+
+    @property
+    def tier(self) -> str:
+        """Current quality tier name"""
+        return TIERS[self.tier_index]
+
+    def record_latency(self, elapsed_ms: float, tier: str) -> None:
+        """Feed one measured emoji key update duration (in milliseconds)
+
+        Samples taken while another tier's media was displayed are ignored.
+        """
+        with self._lock:
+            if tier != self.tier:
+                return
+
+            if self._average_ms is None:
+                self._average_ms = elapsed_ms
+            else:
+                self._average_ms += self.smoothing * (elapsed_ms - self._average_ms)
+            self._samples += 1
+
+            if self._samples < self.min_samples:
+                return
+            self._entry_average_ms.setdefault(self.tier_index, self._average_ms)
+
+            if self._average_ms > self.target_ms:
+                self._calm_samples = 0
+                if self.tier_index < len(TIERS) - 1:
+                    self._step_down()
+                return
+
+            if self.tier_index == 0:
+                return
+            projected = self._projected_better_ms()
+            if projected is None or projected <= self.target_ms * self.recover_margin:
+                self._calm_samples += 1
+            else:
+                self._calm_samples = 0
+
+            if (self._calm_samples >= self.recover_samples
+                    and time.monotonic() >= self._hold_until):
+                self._change_tier(self.tier_index - 1, "recover")
+                self._last_recover = time.monotonic()
+
+    def _projected_better_ms(self):
+        """Estimate the next better tier's average from the current one (lock must be held)"""
+        better_ms = self._left_average_ms.get(self.tier_index - 1)
+        entry_ms = self._entry_average_ms.get(self.tier_index)
+        if better_ms is None or not entry_ms:
+            return None
+        return better_ms * self._average_ms / entry_ms
+
+    def _step_down(self) -> None:
+        """Move to the next cheaper tier and extend the cooldown (lock must be held)"""
+        now = time.monotonic()
+        if now - self._last_recover > self.max_cooldown:
+            # Stable for a long time: forget earlier failures
+            self._cooldown = self.base_cooldown
+        self._hold_until = now + self._cooldown
+        self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+
+        self._left_average_ms[self.tier_index] = self._average_ms
+        self._entry_average_ms.pop(self.tier_index + 1, None)
+        self._change_tier(self.tier_index + 1, "degrade")
+
+    def _change_tier(self, new_index: int, reason: str) -> None:
+        """Switch tier and restart measurement (lock must be held)"""
+        old_tier = self.tier
+        self.tier_index = new_index
+        self._record_change(old_tier, self.tier, reason, self._average_ms)
+        log.info(f"Render quality {reason}: {old_tier} -> {self.tier} "
+                 f"(avg {self._average_ms:.1f}ms, target {self.target_ms:.1f}ms)")
+
+        # Each tier is judged on its own measurements
+        self._average_ms = None
+        self._samples = 0
+        self._calm_samples = 0
+
+        # Prepare the new tier's media off the key update path
+        self._schedule_builds()
+
+    def _record_change(self, old_tier, new_tier: str, reason: str, average_ms) -> None:
+        """Append an entry to the tier history"""
+        self.history.append({
+            "time": time.time(),
+            "from": old_tier,
+            "to": new_tier,
+            "reason": reason,
+            "average_ms": average_ms,
+        })
+
+    def get_diagnostics(self) -> dict:
+        """Return the current tier, latency average and tier history"""
+        with self._lock:
+            return {
+                "tier": self.tier,
+                "average_ms": self._average_ms,
+                "target_ms": self.target_ms,
+                "samples": self._samples,
+                "cooldown": self._cooldown,
+                "history": list(self.history),
+            }
+
+    def set_active(self, sources: dict) -> None:
+        """Set the emojis of the current game (codepoint -> source GIF path)
+
+        Their variants for the current tier are built in the background.
+        """
+        with self._lock:
+            self._active = dict(sources)
+            self._schedule_builds()
+
+    def _schedule_builds(self) -> None:
+        """Wake the variant builder, starting it if needed (lock must be held)"""
+        self._builds_pending.set()
+        if self._builder is None:
+            self._builder = threading.Thread(target=self._run_builder,
+                                             name="EmojiVariantBuilder", daemon=True)
+            self._builder.start()
+
+    def _run_builder(self) -> None:
+        """Builder loop: render missing variants of active emojis for the current tier"""
+        while True:
+            self._builds_pending.wait()
+            self._builds_pending.clear()
+            with self._lock:
+                tier = self.tier
+                active = list(self._active.items())
+            if tier == TIER_FULL:
+                self._prune_other_tiers(tier)
+                continue
+
+            for codepoint, source_path in active:
+                if self._builds_pending.is_set():
+                    break  # Tier or game changed, start over
+                variant_path = self._variant_path(tier, codepoint)
+                if os.path.exists(variant_path) or not os.path.exists(source_path):
+                    continue
+                try:
+                    self._build_variant(tier, codepoint, source_path, variant_path)
+                except Exception as e:
+                    log.warning(f"Could not build {tier} variant of {codepoint}: {e}")
+            else:
+                # Fallback media no longer needed: free the disk space
+                self._prune_other_tiers(tier)
+
+    def _prune_other_tiers(self, tier: str) -> None:
+        """Remove cached variants of every tier but the given one"""
+        for other in TIERS[1:]:
+            directory = os.path.join(self.cache_dir, other)
+            if other == tier or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass  # Discarded by an eviction meanwhile
+
+    def cache_bytes(self) -> int:
+        """Return disk space used by cached variants"""
+        total = 0
+        for tier in TIERS[1:]:
+            directory = os.path.join(self.cache_dir, tier)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                try:
+                    total += os.path.getsize(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass  # Removed by the builder meanwhile
+        return total
+
+    def _variant_path(self, tier: str, codepoint: str) -> str:
+        """Return the cache path of an emoji variant"""
+        extension = "png" if tier == TIER_STATIC else "gif"
+        return os.path.join(self.cache_dir, tier, f"{codepoint}.{extension}")
+
+    def get_media(self, codepoint: str, source_path: str) -> tuple:
+        """Return the media to display for an emoji, its tier and playback fps
+
+        Until the current tier's variant is built, the closest existing one is
+        served, preferring cheaper tiers, then the original GIF.
+        """
+        index = self.tier_index
+        candidates = TIERS[index:] + TIERS[index - 1:0:-1] if index else []
+        for tier in candidates:
+            variant_path = self._variant_path(tier, codepoint)
+            if os.path.exists(variant_path):
+                return variant_path, tier, TIER_FPS[tier]
+        return source_path, TIER_FULL, TIER_FPS[TIER_FULL]
+
+    def discard_variants(self, codepoint: str) -> None:
+        """Remove every cached variant of an emoji (its source GIF is gone)"""
+        with self._lock:
+            # A build in progress for it must not publish its result
+            self._active.pop(codepoint, None)
+            for tier in TIERS[1:]:
+                try:
+                    os.remove(self._variant_path(tier, codepoint))
+                except FileNotFoundError:
+                    pass
+
+    def _build_variant(self, tier: str, codepoint: str, source_path: str,
+                       variant_path: str) -> None:
+        """Render a degraded copy of a GIF into the cache"""
+        os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(variant_path), suffix=".tmp")
+        os.close(fd)
+        try:
+            self._render_variant(tier, source_path, tmp_path)
+            with self._lock:
+                # Drop the result if the emoji was evicted while rendering
+                if codepoint in self._active and os.path.exists(source_path):
+                    os.replace(tmp_path, variant_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _render_variant(self, tier: str, source_path: str, output_path: str) -> None:
+        """Write a degraded copy of a GIF to output_path"""
+        from PIL import Image, ImageSequence
+
+        with Image.open(source_path) as gif:
+            if tier == TIER_STATIC:
+                gif.seek(0)
+                gif.convert("RGBA").save(output_path, format="PNG")
+                return
+
+            frames = []
+            durations = []
+            for i, frame in enumerate(ImageSequence.Iterator(gif)):
+                duration = frame.info.get("duration", gif.info.get("duration", 100))
+                if i % 2 == 0:
+                    frame = frame.convert("RGBA")
+                    if tier == TIER_LOW_RES:
+                        frame.thumbnail((LOW_RES_SIZE, LOW_RES_SIZE))
+                    frames.append(frame)
+                    durations.append(duration)
+                else:
+                    # Keep the overall animation speed
+                    durations[-1] += duration
+
+        frames[0].save(
+            output_path,
+            format="GIF",
+            save_all=True,
+            append_images=frames[1:],
+            duration=durations,
+            loop=0,
+            disposal=2,
+        )